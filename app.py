@@ -10,21 +10,52 @@
 #
 # SPDX-License-Identifier: CC-BY-4.0
 
+import functools
+import json
+
 import dash
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from dash import dcc
 from dash import html
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from flask import Response, abort
 
 # Load data
-estimates = pd.read_csv("data/estimates.csv", keep_default_na=False)
-sources = pd.read_csv("data/sources.csv", keep_default_na=False)
+#
+# Low-cardinality text columns are loaded as categoricals so the equality
+# filters below compare integer codes rather than strings, and integer columns
+# use narrow integer types. Only the columns listed here are used, so the rest
+# (references, notes, etc.) are not parsed at all.
+ESTIMATES_DTYPES = {
+    "Method": "category",
+    "Geography": "category",
+    "Estimate year": "int16",
+    "Value (TWh)": "float64",
+}
+SOURCES_DTYPES = {
+    "Source (Grouped for Visualisations)": "category",
+    "Authors": "category",
+    "Citation Count": "int32",
+    "Source Reliability": "category",
+}
+
+estimates = pd.read_csv(
+    "data/estimates.csv",
+    keep_default_na=False,
+    usecols=list(ESTIMATES_DTYPES),
+    dtype=ESTIMATES_DTYPES,
+)
+# The sources are only used by the Sankey diagrams, so they are loaded the
+# first time one of those is built (see load_sources)
 
 # Set up app
 title = "Sources of data center energy estimates: A comprehensive review"
-app = dash.Dash(title=title)
+app = dash.Dash(title=title, compress=True)
+server = app.server  # For WSGI servers, e.g. gunicorn app:server
 
 config = {
     "toImageButtonOptions": {
@@ -32,6 +63,28 @@ config = {
     }
 }
 
+# Styling shared by the box plots, as a template that is layered on top of
+# plotly_white
+pio.templates["review"] = go.layout.Template(
+    layout={
+        "font": {"family": "sans-serif", "size": 16},
+        "xaxis": {"showline": True, "linewidth": 1, "linecolor": "black"},
+        "yaxis": {"showline": True, "linewidth": 1, "linecolor": "black"},
+    }
+)
+box_template = "plotly_white+review"
+
+# Layout shared by the box plots, applied once each figure has been built. The
+# y axis range is set here because plotly.js ignores axis ranges in templates.
+box_layout = {"yaxis": {"range": [0, 2000]}}
+
+# Estimate years and methods compared in Figures 2 and 4
+YEARS = [2010, 2020, 2030]
+METHODS = ["Bottom-up", "Extrapolation"]
+
+# Only these columns are plotted, so the filtered views keep just these
+figure_columns = ["Estimate year", "Method", "Value (TWh)"]
+
 
 #
 # Basic stats
@@ -39,20 +92,38 @@ config = {
 # Numbers/counts of things included in the review.
 total_estimates = len(estimates.index)
 
-result = estimates.query('Geography == "Global"')
-total_estimates_global = len(result.index)
-
-result = estimates.query('Geography == "USA"')
-total_estimates_us = len(result.index)
+# Geographies counted towards the Europe total
+EUROPE = frozenset({"EU25", "EU27", "EU28", "Europe", "Western Europe"})
 
-result = estimates.query(
-    'Geography == "EU25" or \
-    Geography == "EU27" or \
-    Geography == "EU28" or \
-    Geography == "Europe" or \
-    Geography == "Western Europe"'
+# Count every geography in one pass and read the totals from that
+geography_counts = estimates["Geography"].value_counts()
+total_estimates_global = int(geography_counts.get("Global", 0))
+total_estimates_us = int(geography_counts.get("USA", 0))
+total_estimates_europe = int(
+    geography_counts[geography_counts.index.isin(EUROPE)].sum()
 )
-total_estimates_europe = len(result.index)
+
+
+#
+# Global estimates, which every box plot is drawn from. Filtered once here so
+# the per-figure views below only scan the global rows.
+#
+estimates_global = estimates.loc[estimates["Geography"].eq("Global"), figure_columns]
+
+#
+# Global bottom-up and extrapolation estimates for the years compared in
+# Figures 2 and 4, with and without estimates >2000 TWh (keyed by whether they
+# are excluded)
+#
+comparison_data = {
+    False: estimates_global.loc[
+        estimates_global["Method"].isin(METHODS)
+        & estimates_global["Estimate year"].isin(YEARS)
+    ]
+}
+comparison_data[True] = comparison_data[False].loc[
+    comparison_data[False]["Value (TWh)"] < 2000
+]
 
 
 #
@@ -68,43 +139,55 @@ total_estimates_europe = len(result.index)
 #
 # Fall back solution is a check box option to exclude estimates >2000 TWh
 # (default = true).
-@app.callback(Output("fig-2", "figure"), [Input("fig-2-exclude", "value")])
-def generate_fig(exclude):
-    if not exclude:
-        figresult = estimates.query(
-            '(Method == "Bottom-up" or Method == "Extrapolation") and Geography == "Global" and (`Estimate year` == 2010 or `Estimate year` == 2020 or `Estimate year` == 2030)'
-        )
-    else:
-        figresult = estimates.query(
-            '(Method == "Bottom-up" or Method == "Extrapolation") and Geography == "Global" and (`Estimate year` == 2010 or `Estimate year` == 2020 or `Estimate year` == 2030) and `Value (TWh)` < 2000'
-        )
+fig2_stats = {
+    exclude: figresult.groupby("Estimate year")["Value (TWh)"].agg(
+        ["min", "max", "median", "count"]
+    )
+    for exclude, figresult in comparison_data.items()
+}
+
+
+# There are only two possible inputs, so both versions of each box plot are
+# built at startup and stored in the page (see figure_states), and the
+# checkbox swaps between them in the browser without a server round trip
+def build_fig2(exclude):
+    figresult = comparison_data[exclude]
+    stats = fig2_stats[exclude]
 
-    fig = px.box(figresult, x="Estimate year", y="Value (TWh)", template="plotly_white")
-    fig.update_layout(font_family="sans-serif", font_size=16)
-    fig.update_xaxes(showline=True, linewidth=1, linecolor="black")
-    fig.update_yaxes(showline=True, linewidth=1, linecolor="black")
-    fig.update_layout(yaxis_range=[0, 2000])
+    fig = px.box(figresult, x="Estimate year", y="Value (TWh)", template=box_template)
 
     # Show values
-    for s in figresult["Estimate year"].unique():
+    annotations = []
+    for s in YEARS:
+        # Excluding estimates can leave a year without any
+        if s not in stats.index:
+            continue
+
+        vmin = stats.at[s, "min"]
+        vmax = stats.at[s, "max"]
+        vmedian = stats.at[s, "median"]
+        count = stats.at[s, "count"]
+
         # Max
-        fig.add_annotation(
-            x=s,
-            y=figresult[figresult["Estimate year"] == s]["Value (TWh)"].max(),
-            text="max = "
-            + str(figresult[figresult["Estimate year"] == s]["Value (TWh)"].max()),
-            yshift=10,
-            showarrow=False,
+        annotations.append(
+            dict(
+                x=s,
+                y=vmax,
+                text=f"max = {vmax}",
+                yshift=10,
+                showarrow=False,
+            )
         )
 
         # Count
-        fig.add_annotation(
-            x=s,
-            y=figresult[figresult["Estimate year"] == s]["Value (TWh)"].max(),
-            text="n = "
-            + str(len(figresult[figresult["Estimate year"] == s]["Value (TWh)"])),
-            yshift=25,
-            showarrow=False,
+        annotations.append(
+            dict(
+                x=s,
+                y=vmax,
+                text=f"n = {count}",
+                yshift=25,
+                showarrow=False,
+            )
         )
 
         # Position the median annotation
@@ -114,28 +197,40 @@ def generate_fig(exclude):
             yshift = 60  # Above the count, because there's no space
 
         # Median
-        fig.add_annotation(
-            x=s,
-            y=figresult[figresult["Estimate year"] == s]["Value (TWh)"].median(),
-            text="median = "
-            + str(figresult[figresult["Estimate year"] == s]["Value (TWh)"].median()),
-            yshift=yshift,
-            showarrow=False,
+        annotations.append(
+            dict(
+                x=s,
+                y=vmedian,
+                text=f"median = {vmedian}",
+                yshift=yshift,
+                showarrow=False,
+            )
         )
 
         # Min
-        fig.add_annotation(
-            x=s,
-            y=figresult[figresult["Estimate year"] == s]["Value (TWh)"].min(),
-            text="min = "
-            + str(figresult[figresult["Estimate year"] == s]["Value (TWh)"].min()),
-            yshift=-10,
-            showarrow=False,
+        annotations.append(
+            dict(
+                x=s,
+                y=vmin,
+                text=f"min = {vmin}",
+                yshift=-10,
+                showarrow=False,
+            )
         )
 
+    fig.update_layout(box_layout, annotations=annotations)
+
     return fig
 
 
+app.clientside_callback(
+    ClientsideFunction(namespace="figures", function_name="toggle"),
+    Output("fig-2", "figure"),
+    [Input("fig-2-exclude", "value")],
+    [State("fig-2-data", "data")],
+)
+
+
 #
 # Figure 4
 #
@@ -150,346 +245,394 @@ def generate_fig(exclude):
 #
 # Fall back solution is a check box option to exclude estimates >2000 TWh
 # (default = true).
-@app.callback(Output("fig-4", "figure"), [Input("fig-4-exclude", "value")])
-def generate_fig(exclude):
-    if not exclude:
-        figresult = estimates.query(
-            '(Method == "Bottom-up" or Method == "Extrapolation") and Geography == "Global" and (`Estimate year` == 2010 or `Estimate year` == 2020 or `Estimate year` == 2030)'
-        )
-    else:
-        figresult = estimates.query(
-            '(Method == "Bottom-up" or Method == "Extrapolation") and Geography == "Global" and (`Estimate year` == 2010 or `Estimate year` == 2020 or `Estimate year` == 2030) and `Value (TWh)` < 2000'
-        )
+fig4_stats = {
+    exclude: figresult.groupby(["Estimate year", "Method"], observed=True)[
+        "Value (TWh)"
+    ].agg(["min", "max", "median", "count"])
+    for exclude, figresult in comparison_data.items()
+}
+
+
+def build_fig4(exclude):
+    figresult = comparison_data[exclude]
+    stats = fig4_stats[exclude]
 
     fig = px.box(
         figresult,
         x="Estimate year",
         y="Value (TWh)",
-        template="plotly_white",
+        template=box_template,
         color="Method",
     )
-    fig.update_layout(font_family="sans-serif", font_size=16)
-    fig.update_xaxes(showline=True, linewidth=1, linecolor="black")
-    fig.update_yaxes(showline=True, linewidth=1, linecolor="black")
-    fig.update_layout(yaxis_range=[0, 2000])
 
     # Show values
-    for s in figresult["Estimate year"].unique():
-        for m in figresult["Method"].unique():
+    annotations = []
+    for s, m, vmin, vmax, vmedian, count in stats.reset_index().itertuples(
+        index=False, name=None
+    ):
+        # Position annotations
+        if m == "Extrapolation":
+            xshift = -75
+        elif m == "Bottom-up":
+            xshift = 75
 
-            # Position annotations
-            if m == "Extrapolation":
-                xshift = -75
-            elif m == "Bottom-up":
-                xshift = 75
-
-            # Max
-            fig.add_annotation(
+        # Max
+        annotations.append(
+            dict(
                 x=s,
-                y=figresult[figresult["Estimate year"] == s][figresult["Method"] == m][
-                    "Value (TWh)"
-                ].max(),
-                text="max = "
-                + str(
-                    figresult[figresult["Estimate year"] == s][
-                        figresult["Method"] == m
-                    ]["Value (TWh)"].max()
-                ),
+                y=vmax,
+                text=f"max = {vmax}",
                 xshift=xshift,
                 yshift=15,
                 showarrow=False,
             )
+        )
 
-            # Min
-            fig.add_annotation(
+        # Min
+        annotations.append(
+            dict(
                 x=s,
-                y=figresult[figresult["Estimate year"] == s][figresult["Method"] == m][
-                    "Value (TWh)"
-                ].min(),
-                text="min = "
-                + str(
-                    figresult[figresult["Estimate year"] == s][
-                        figresult["Method"] == m
-                    ]["Value (TWh)"].min()
-                ),
+                y=vmin,
+                text=f"min = {vmin}",
                 xshift=xshift,
                 yshift=-10,
                 showarrow=False,
             )
+        )
 
-            if s == 2010:
+        if s == 2010:
+            yshift = 50
+        else:
+            if s == 2020 and m == "Extrapolation":
+                yshift = 50
+            elif s == 2020 and m == "Bottom-up":
+                yshift = 45
+            elif s == 2030 and m == "Extrapolation":
+                yshift = 50
+            elif s == 2030 and m == "Bottom-up":
                 yshift = 50
-            else:
-                if s == 2020 and m == "Extrapolation":
-                    yshift = 50
-                elif s == 2020 and m == "Bottom-up":
-                    yshift = 45
-                elif s == 2030 and m == "Extrapolation":
-                    yshift = 50
-                elif s == 2030 and m == "Bottom-up":
-                    yshift = 50
-
-            # Count
-            fig.add_annotation(
+
+        # Count
+        annotations.append(
+            dict(
                 x=s,
-                y=figresult[figresult["Estimate year"] == s][figresult["Method"] == m][
-                    "Value (TWh)"
-                ].max(),
-                text="n = "
-                + str(
-                    len(
-                        figresult[figresult["Estimate year"] == s][
-                            figresult["Method"] == m
-                        ]["Value (TWh)"]
-                    )
-                ),
+                y=vmax,
+                text=f"n = {count}",
                 xshift=xshift,
                 yshift=yshift,
                 showarrow=False,
             )
+        )
 
-            if s == 2010:
-                yshift = 45
-            else:
-                if s == 2020 and m == "Extrapolation":
-                    yshift = 170
-                elif s == 2020 and m == "Bottom-up":
-                    yshift = 30
-                elif s == 2030 and m == "Extrapolation":
-                    yshift = 180
-                elif s == 2030 and m == "Bottom-up":
-                    yshift = 70
-
-            # Median
-            fig.add_annotation(
+        if s == 2010:
+            yshift = 45
+        else:
+            if s == 2020 and m == "Extrapolation":
+                yshift = 170
+            elif s == 2020 and m == "Bottom-up":
+                yshift = 30
+            elif s == 2030 and m == "Extrapolation":
+                yshift = 180
+            elif s == 2030 and m == "Bottom-up":
+                yshift = 70
+
+        # Median
+        annotations.append(
+            dict(
                 x=s,
-                y=figresult[figresult["Estimate year"] == s][figresult["Method"] == m][
-                    "Value (TWh)"
-                ].median(),
-                text="median = "
-                + str(
-                    figresult[figresult["Estimate year"] == s][
-                        figresult["Method"] == m
-                    ]["Value (TWh)"].median()
-                ),
+                y=vmedian,
+                text=f"median = {vmedian}",
                 xshift=xshift,
                 yshift=yshift,
                 showarrow=False,
             )
+        )
+
+    fig.update_layout(box_layout, annotations=annotations)
 
     return fig
 
 
+app.clientside_callback(
+    ClientsideFunction(namespace="figures", function_name="toggle"),
+    Output("fig-4", "figure"),
+    [Input("fig-4-exclude", "value")],
+    [State("fig-4-data", "data")],
+)
+
+
 #
 # Figure 5a
 #
 # Global data center energy estimates for 2010-2030.
 #
 # Check box option to exclude estimates >2000 TWh (default = true).
-@app.callback(Output("fig-5a", "figure"), [Input("fig-5a-exclude", "value")])
-def generate_fig(exclude):
-    if not exclude:
-        figresult = estimates.query('Geography == "Global" and `Estimate year` >= 2010')
-    else:
-        figresult = estimates.query(
-            'Geography == "Global" and `Estimate year` >= 2010 and `Value (TWh)` < 2000',
-            engine="python",
-        )
-    fig = px.box(figresult, x="Estimate year", y="Value (TWh)", template="plotly_white")
-    fig.update_layout(font_family="sans-serif", font_size=16)
-    fig.update_xaxes(showline=True, linewidth=1, linecolor="black")
-    fig.update_yaxes(showline=True, linewidth=1, linecolor="black")
-    fig.update_layout(yaxis_range=[0, 2000])
+fig5_data = {False: estimates_global.loc[estimates_global["Estimate year"] >= 2010]}
+fig5_data[True] = fig5_data[False].loc[fig5_data[False]["Value (TWh)"] < 2000]
+fig5a_stats = {
+    exclude: figresult.groupby("Estimate year")["Value (TWh)"].agg(["max", "count"])
+    for exclude, figresult in fig5_data.items()
+}
+
+
+def build_fig5a(exclude):
+    figresult = fig5_data[exclude]
+    stats = fig5a_stats[exclude]
+
+    fig = px.box(figresult, x="Estimate year", y="Value (TWh)", template=box_template)
 
     # Show estimate counts
-    for s in figresult["Estimate year"].unique():
-        fig.add_annotation(
-            x=s,
-            y=figresult[figresult["Estimate year"] == s]["Value (TWh)"].max(),
-            text=str(len(figresult[figresult["Estimate year"] == s]["Value (TWh)"])),
-            yshift=10,
-            showarrow=False,
+    annotations = []
+    for s in stats.index:
+        annotations.append(
+            dict(
+                x=s,
+                y=stats.at[s, "max"],
+                text=str(stats.at[s, "count"]),
+                yshift=10,
+                showarrow=False,
+            )
         )
 
+    fig.update_layout(box_layout, annotations=annotations)
+
     return fig
 
 
+app.clientside_callback(
+    ClientsideFunction(namespace="figures", function_name="toggle"),
+    Output("fig-5a", "figure"),
+    [Input("fig-5a-exclude", "value")],
+    [State("fig-5a-data", "data")],
+)
+
+
 #
 # Figure 5b
 #
 # Global data center energy estimates for 2010-2030.
 #
 # Check box option to exclude estimates >2000 TWh (default = true).
-@app.callback(Output("fig-5b", "figure"), [Input("fig-5b-exclude", "value")])
-def generate_fig(exclude):
-    if not exclude:
-        figresult = estimates.query('Geography == "Global" and `Estimate year` >= 2010')
-    else:
-        figresult = estimates.query(
-            'Geography == "Global" and `Estimate year` >= 2010 and `Value (TWh)` < 2000',
-            engine="python",
-        )
+def build_fig5b(exclude):
+    figresult = fig5_data[exclude]
+
     fig = px.box(
         figresult,
         x="Estimate year",
         y="Value (TWh)",
-        template="plotly_white",
+        template=box_template,
         color="Method",
     )
-    fig.update_layout(font_family="sans-serif", font_size=16)
-    fig.update_xaxes(showline=True, linewidth=1, linecolor="black")
-    fig.update_yaxes(showline=True, linewidth=1, linecolor="black")
-    fig.update_layout(yaxis_range=[0, 2000])
+    fig.update_layout(box_layout)
 
     return fig
 
 
+app.clientside_callback(
+    ClientsideFunction(namespace="figures", function_name="toggle"),
+    Output("fig-5b", "figure"),
+    [Input("fig-5b-exclude", "value")],
+    [State("fig-5b-data", "data")],
+)
+
+
+#
+# Both states of a box plot, for the dcc.Store the clientside toggle reads
+#
+def figure_states(build):
+    return {
+        "all": build(False).to_plotly_json(),
+        "exclude": build(True).to_plotly_json(),
+    }
+
+
 #
-# Generate a sankey diagram from the items passed through
+# Color each row of the items passed through, as used in the sankey diagrams
 #
 # items = pandas.DataFrame
 #
-def sankey(items):
+def sankey_colors(items):
     # Define colors
     COLOR_FOUND_DARK = "black"
     COLOR_FOUND_LIGHT = "lightgray"
     COLOR_CITATIONS_GTE1000_DARK = "#ffc6cf"  # Citations >= 1000 = Dark red
-    COLOR_CITATIONS_GTE1000_LIGHT = "#ffc6cf"  # Citations >= 1000 = Light red
     COLOR_CITATIONS_GTE500_DARK = "#ffea9c"  # Citations >= 500 = Dark yellow
-    COLOR_CITATIONS_GTE500_LIGHT = "#ffea9c"  # Citations >= 500 = Light yellow
     COLOR_CITATIONS_GTE100_DARK = "#c6eece"  # Citations >= 100 = Dark green
-    COLOR_CITATIONS_GTE100_LIGHT = "#c6eece"  # Citations >= 100 = Light green
     # From https://colorbrewer2.org/#type=diverging&scheme=PuOr&n=3
     COLOR_NOTFOUND_DARK = "#f1a340"  # Orange
     COLOR_NOTFOUND_LIGHT = "#fcdfba"  # Light orange
 
-    # Build the lists
-    labels = []  # Labels (unique)
-    colors_node = []  # Colors mapped to labels
-    colors_link = []  # Colors mapped to links
-    sources = []  # Index for each source for a link, mapped to label
-    targets = []  # Target for each link, mapped to label
-    values = []  # Value for each node, which determines its size, mapped to label
-
-    # Loop through every row and build the lists to create the Sankey
-    for index, row in items.iterrows():
-        # Determine if we need to create a new label
-        if row["Authors"] not in labels:
-            if row["Citation Count"] >= 1000:
-                color_node = COLOR_CITATIONS_GTE1000_DARK
-                color_link = COLOR_CITATIONS_GTE1000_LIGHT
-            elif row["Citation Count"] >= 500:
-                color_node = COLOR_CITATIONS_GTE500_DARK
-                color_link = COLOR_CITATIONS_GTE500_LIGHT
-            elif row["Citation Count"] >= 100:
-                color_node = COLOR_CITATIONS_GTE100_DARK
-                color_link = COLOR_CITATIONS_GTE100_LIGHT
-            else:
-                color_node = COLOR_FOUND_DARK
-                color_link = COLOR_FOUND_LIGHT
-
-            labels.append(row["Authors"])
-            colors_node.append(color_node)
-
-        # Set the color based on the source reliability classification, but hard
-        # code any sources which are also in the review
-        # Colors from https://colorbrewer2.org/#type=diverging&scheme=PuOr&n=3
-        if row["Source (Grouped for Visualisations)"] == "IDC":
-            color_node = COLOR_NOTFOUND_DARK
-            color_link = COLOR_NOTFOUND_LIGHT
-        elif row["Source Reliability"] == "EL" or row["Source Reliability"] == "PD":
-            color_node = COLOR_FOUND_DARK
-            color_link = COLOR_FOUND_LIGHT
-        else:
-            color_node = COLOR_NOTFOUND_DARK
-            color_link = COLOR_NOTFOUND_LIGHT
+    # Color the publications by citation count
+    citations = items["Citation Count"].to_numpy()
+    colors_author = np.select(
+        [citations >= 1000, citations >= 500, citations >= 100],
+        [
+            COLOR_CITATIONS_GTE1000_DARK,
+            COLOR_CITATIONS_GTE500_DARK,
+            COLOR_CITATIONS_GTE100_DARK,
+        ],
+        default=COLOR_FOUND_DARK,
+    )
+
+    # Set the color based on the source reliability classification, but hard
+    # code any sources which are also in the review
+    # Colors from https://colorbrewer2.org/#type=diverging&scheme=PuOr&n=3
+    not_found = (
+        items["Source (Grouped for Visualisations)"].eq("IDC")
+        | ~items["Source Reliability"].isin(["EL", "PD"])
+    ).to_numpy()
+    colors_source = np.where(not_found, COLOR_NOTFOUND_DARK, COLOR_FOUND_DARK)
+    colors_link = np.where(not_found, COLOR_NOTFOUND_LIGHT, COLOR_FOUND_LIGHT)
+
+    return items.assign(
+        **{
+            "Author Color": colors_author,
+            "Source Color": colors_source,
+            "Link Color": colors_link,
+        }
+    )
 
-        if row["Source (Grouped for Visualisations)"] not in labels:
-            labels.append(row["Source (Grouped for Visualisations)"])
-            colors_node.append(color_node)
 
-        # Create the node and link
-        sources.append(labels.index(row["Source (Grouped for Visualisations)"]))
-        targets.append(labels.index(row["Authors"]))
-        colors_link.append(color_link)
+#
+# Generate a sankey diagram from the items passed through, which must already
+# have been colored by sankey_colors
+#
+# items = pandas.DataFrame
+#
+def sankey(items):
+    # Interleave the author and source of each row so that the labels (unique)
+    # are numbered in the order they are first seen, with the color of the row
+    # that introduced them
+    names = np.empty(2 * len(items.index), dtype=object)
+    names[0::2] = items["Authors"].to_numpy(dtype=object)
+    names[1::2] = items["Source (Grouped for Visualisations)"].to_numpy(dtype=object)
+    colors = np.empty(2 * len(items.index), dtype=object)
+    colors[0::2] = items["Author Color"].to_numpy()
+    colors[1::2] = items["Source Color"].to_numpy()
+
+    codes, labels = pd.factorize(names)
+    colors_node = colors[~pd.Series(codes).duplicated().to_numpy()]
+
+    # Create the nodes and links
+    sources = codes[1::2]  # Index for each source for a link, mapped to label
+    targets = codes[0::2]  # Target for each link, mapped to label
+
+    # Link size is always 1 because there's no useful alternative to size them on
+    # The size of the node is determined automatically based on the number of
+    # links, which is the same as the number of references
+    values = np.ones(len(items.index), dtype=np.int32)
+
+    return (
+        labels.tolist(),
+        colors_node.tolist(),
+        items["Link Color"].tolist(),
+        sources.tolist(),
+        targets.tolist(),
+        values.tolist(),
+    )
 
-        # Link size is always 1 because there's no useful alternative to size them on
-        # The size of the node is determined automatically based on the number of
-        # links, which is the same as the number of references
-        values.append(1)
 
-    return labels, colors_node, colors_link, sources, targets, values
+#
+# Create a sankey diagram figure of the items passed through
+#
+# items = pandas.DataFrame
+#
+def sankey_figure(items, height):
+    labels, colors_node, colors_link, sources, targets, values = sankey(items)
+
+    # Built from a plain dict rather than go.Sankey(node=..., link=...) so the
+    # trace is only validated once, when the figure is created
+    return go.Figure(
+        {
+            "data": [
+                {
+                    "type": "sankey",
+                    "node": {
+                        "pad": 15,
+                        "thickness": 20,
+                        "label": labels,
+                        "color": colors_node,
+                    },
+                    "link": {
+                        "source": sources,
+                        "target": targets,
+                        "value": values,
+                        "color": colors_link,
+                    },
+                }
+            ],
+            "layout": {"font": {"family": "sans-serif"}, "height": height},
+        }
+    )
 
 
 #
-# De-dup the sources
+# Load and de-dup the sources, and color every row once for all the sankey
+# diagrams
 #
-sources_unique = sources.drop_duplicates(
-    subset=["Authors", "Source (Grouped for Visualisations)"]
-)
+@functools.lru_cache(maxsize=None)
+def load_sources():
+    sources = pd.read_csv(
+        "data/sources.csv",
+        keep_default_na=False,
+        usecols=list(SOURCES_DTYPES),
+        dtype=SOURCES_DTYPES,
+    )
+
+    return sankey_colors(
+        sources.drop_duplicates(
+            subset=["Authors", "Source (Grouped for Visualisations)"],
+            ignore_index=True,
+        )
+    )
+
+
+#
+# Split out the publications shown in Figures 6 and 7 in a single pass
+#
+sankey_authors = {
+    "Corcoran & Andrae, 2013": "fig6",
+    "Andrae & Edler, 2015": "fig6",
+    "The Shift Project, 2019": "fig6",
+    "Van Heddeghem et al., 2014": "fig7",
+    "Shehabi et al., 2016": "fig7",
+    "Malmodin & Lunden, 2018a": "fig7",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def sources_by_figure():
+    sources_unique = load_sources()
+
+    return dict(
+        tuple(
+            sources_unique.groupby(
+                sources_unique["Authors"].map(sankey_authors), observed=True, sort=False
+            )
+        )
+    )
+
 
 #
 # Figure 6
 #
 # Sankey diagram showing the flow of citations
 #
-sources_fig6 = sources_unique.query(
-    'Authors == "Corcoran & Andrae, 2013" or Authors == "Andrae & Edler, 2015" or Authors == "The Shift Project, 2019"'
-)
-labels, colors_node, colors_link, sources, targets, values = sankey(sources_fig6)
-
-# Create the figure
-fig6 = go.Figure(
-    data=[
-        go.Sankey(
-            node=dict(
-                pad=15,
-                thickness=20,
-                label=labels,
-                color=colors_node,
-            ),
-            link=dict(
-                source=sources,
-                target=targets,
-                value=values,
-                color=colors_link,
-            ),
-        )
-    ]
-)
+def build_fig6():
+    sources_fig6 = sources_by_figure()["fig6"]
+
+    return sankey_figure(sources_fig6, height=1000)
 
-fig6.update_layout(font_family="sans-serif", height=1000)
 
 #
 # Figure 7
 # Sankey diagram showing the flow of citations
 #
-sources_fig7 = sources_unique.query(
-    'Authors == "Van Heddeghem et al., 2014" or Authors == "Shehabi et al., 2016" or Authors == "Malmodin & Lunden, 2018a"'
-)
-labels, colors_node, colors_link, sources, targets, values = sankey(sources_fig6)
-
-# Create the figure
-fig7 = go.Figure(
-    data=[
-        go.Sankey(
-            node=dict(
-                pad=15,
-                thickness=20,
-                label=labels,
-                color=colors_node,
-            ),
-            link=dict(
-                source=sources,
-                target=targets,
-                value=values,
-                color=colors_link,
-            ),
-        )
-    ]
-)
+def build_fig7():
+    sources_fig7 = sources_by_figure()["fig7"]
+
+    return sankey_figure(sources_fig7, height=1000)
 
-fig7.update_layout(font_family="sans-serif", height=1000)
 
 #
 # Figure X
@@ -497,30 +640,59 @@ fig7.update_layout(font_family="sans-serif", height=1000)
 # Sankey diagram showing data center energy estimate publications analyzed in
 # this review that have >=100 citations
 #
-sources_figx = sources_unique.query("`Citation Count` >= 100")
-labels, colors_node, colors_link, sources, targets, values = sankey(sources_figx)
-
-# Create the figure
-figx = go.Figure(
-    data=[
-        go.Sankey(
-            node=dict(
-                pad=15,
-                thickness=20,
-                label=labels,
-                color=colors_node,
-            ),
-            link=dict(
-                source=sources,
-                target=targets,
-                value=values,
-                color=colors_link,
-            ),
-        )
-    ]
-)
+def build_figx():
+    sources_unique = load_sources()
+    sources_figx = sources_unique.loc[sources_unique["Citation Count"] >= 100]
+
+    return sankey_figure(sources_figx, height=2000)
+
+
+#
+# Static figures
+#
+# The Sankey diagrams never change, so they are only built and serialized to
+# JSON the first time they are requested rather than at startup. The page
+# loads them through the callbacks below, which return the decoded figure
+# cached by static_figure_data (Dash still encodes each callback response),
+# and they are also available at /figures/<name>.json.
+static_figure_builders = {"fig6": build_fig6, "fig7": build_fig7, "figx": build_figx}
+
+
+@functools.lru_cache(maxsize=None)
+def static_figure_json(name):
+    return static_figure_builders[name]().to_json()
+
+
+@functools.lru_cache(maxsize=None)
+def static_figure_data(name):
+    return json.loads(static_figure_json(name))
+
+
+@app.server.route("/figures/<name>.json")
+def static_figure(name):
+    if name not in static_figure_builders:
+        abort(404)
+
+    return Response(
+        static_figure_json(name),
+        mimetype="application/json",
+        headers={"Cache-Control": "public, max-age=86400"},
+    )
+
+
+@app.callback(Output("fig-6", "figure"), [Input("fig-6", "id")])
+def generate_fig(_):
+    return static_figure_data("fig6")
+
+
+@app.callback(Output("fig-7", "figure"), [Input("fig-7", "id")])
+def generate_fig(_):
+    return static_figure_data("fig7")
+
 
-figx.update_layout(font_family="sans-serif", height=2000)
+@app.callback(Output("fig-x", "figure"), [Input("fig-x", "id")])
+def generate_fig(_):
+    return static_figure_data("figx")
 
 
 #
@@ -590,6 +762,7 @@ the visualization. All estimates can be found in Table S2. """
             labelStyle={"display": "inline-block"},
         ),
         dcc.Graph(id="fig-2", config=config),
+        dcc.Store(id="fig-2-data", data=figure_states(build_fig2)),
         html.H2("Figure 4"),
         dcc.Markdown(
             """
@@ -611,6 +784,7 @@ Table S2."""
             labelStyle={"display": "inline-block"},
         ),
         dcc.Graph(id="fig-4", config=config),
+        dcc.Store(id="fig-4-data", data=figure_states(build_fig4)),
         html.H2("Figure 5a"),
         dcc.Markdown(
             """
@@ -627,6 +801,7 @@ estimates can be found in Table S2."""
             labelStyle={"display": "inline-block"},
         ),
         dcc.Graph(id="fig-5a", config=config),
+        dcc.Store(id="fig-5a-data", data=figure_states(build_fig5a)),
         html.H2("Figure 5b"),
         dcc.Checklist(
             id="fig-5b-exclude",
@@ -635,6 +810,7 @@ estimates can be found in Table S2."""
             labelStyle={"display": "inline-block"},
         ),
         dcc.Graph(id="fig-5b", config=config),
+        dcc.Store(id="fig-5b-data", data=figure_states(build_fig5b)),
         html.H2("Figure 6"),
         dcc.Markdown(
             """
@@ -649,7 +825,7 @@ replicability of the estimate today. See Table S1 for the full list of
 publications, sources, and reasons for sources that could not be found.
     """
         ),
-        dcc.Graph(figure=fig6, config=config),
+        dcc.Graph(id="fig-6", config=config),
         html.H2("Figure 7"),
         dcc.Markdown(
             """
@@ -664,15 +840,19 @@ Google Scholar (green >= 100, yellow >= 500). See Table S1 for the full list of
 publications, sources, and reasons for sources that could not be found.
     """
         ),
-        dcc.Graph(figure=fig7, config=config),
+        dcc.Graph(id="fig-7", config=config),
         html.H2("Figure X"),  # Not currently used
         dcc.Markdown(
             """**Not in manuscript.**
 Sankey diagram showing data center energy estimate publications analyzed in this review that have more >100 citations, and the key sources they cite. Sources in orange indicate that source could not be found. Colored nodes indicate citation count from Google Scholar (green >= 100, yellow >= 500, red >= 1000 citations). See Table S1 for the full list of publications, sources, and reasons for sources that could not be found.
     """
         ),
-        dcc.Graph(figure=figx),
+        dcc.Graph(id="fig-x"),
     ]
 )
 
-app.run_server(debug=True)
+if __name__ == "__main__":
+    # Dash reads DASH_DEBUG=true itself to enable its dev tools. The reloader
+    # stays off because it would run all of the data preparation above a
+    # second time.
+    app.run_server(use_reloader=False, threaded=True)
@@ -0,0 +1,9 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    figures: {
+        // Pick the precomputed figure matching the "Exclude estimates >2000
+        // TWh" checkbox, so toggling it does not need a server round trip
+        toggle: function (exclude, data) {
+            return exclude && exclude.length ? data.exclude : data.all;
+        },
+    },
+});